@@ -0,0 +1,229 @@
+import json
+import threading
+import warnings
+import numpy as np
+import pandas as pd
+import taxonomy as tx
+import utils
+
+# runs with the same values in these columns are repeats of each other
+_GROUP_COLUMNS = ['model', 'taxonomy class', 'image resolution (pretraining) [px]', 'image resolution (finetuning) [px]']
+
+# metric -> True if higher values are better
+_AGGREGATED_METRICS = {
+    'top-1 validation accuracy': True, 'top-5 validation accuracy': True, 'top-1 training accuracy': True,
+    'top-5 training accuracy': True, 'validation loss': False, 'training loss': False,
+    'throughput [ims/s]': True, 'training VRAM [GB]': False, 'training VRAM (single GPU) [GB]': False,
+    'inference VRAM @1 [GB]': False, 'inference VRAM @32 [GB]': False, 'inference VRAM @64 [GB]': False,
+    'inference VRAM @128 [GB]': False, 'total finetuning time [h*GPUs]': False,
+    'total validation time [h*GPUs]': False, 'number of parameters [Millions]': False, 'GFLOPs': False,
+} | {name: True for name in utils.derived_metric_names()}
+
+_BAND_QUANTILES = {'q25': 0.25, 'q75': 0.75}
+
+# file name -> {'groups': {group key: (fingerprint, row)}, 'bands': {class: (fingerprint, bands)},
+#               'snapshot': snapshot hash, 'result': result of prepare_aggregate_info for it}
+_AGGREGATE_CACHE = {}
+# concurrent callbacks for the same snapshot wait for one aggregation instead of all computing it
+_AGGREGATE_LOCK = threading.Lock()
+
+
+def _empty_cache():
+    return {'groups': {}, 'bands': {}, 'snapshot': None, 'result': None}
+
+
+def _group_keys(df):
+    columns = [df[col].astype(object).where(df[col].notna(), None) for col in _GROUP_COLUMNS]
+    return list(zip(*columns))
+
+
+def _aggregate_group(key, rows, metrics, run_dates, deviations):
+    """
+    Summarize the repeats of one model.
+
+    Parameters
+    ----------
+    key : tuple
+        Values of `_GROUP_COLUMNS`.
+    rows : np.ndarray
+        Row indices of the runs in the group.
+    metrics : np.ndarray
+        (runs, metrics) array of all runs, columns in the order of `_AGGREGATED_METRICS`.
+    run_dates : pd.Series
+        Run dates of all runs.
+    deviations : np.ndarray
+        Deviation flags of all runs (see `utils.deviation_flags`).
+
+    Returns
+    -------
+    dict
+        One table row. The best value of each metric is stored under the metric name, so the row can be plotted like a
+        single run, median and spread (max - min) under '<metric> (median)' and '<metric> (spread)'. The deviation
+        flags are combined over all repeats.
+    """
+    values = metrics[rows]
+    with warnings.catch_warnings():
+        # metrics that are missing for all repeats
+        warnings.simplefilter('ignore', RuntimeWarning)
+        maxs = np.nanmax(values, axis=0)
+        mins = np.nanmin(values, axis=0)
+        medians = np.nanmedian(values, axis=0)
+    higher_is_better = np.array(list(_AGGREGATED_METRICS.values()))
+    bests = np.where(higher_is_better, maxs, mins)
+
+    row = dict(zip(_GROUP_COLUMNS, key))
+    model, _, res_pre, res_fine = key
+    row['run name'] = f"{model} @{res_pre}" + (f"->{res_fine}" if res_pre != res_fine else "")
+    row['run key'] = row['run name']
+    row['run date'] = run_dates.iloc[rows].max()
+    row['runs'] = len(rows)
+    row['deviations'] = np.bitwise_or.reduce(deviations[rows]).item()
+    for i, metric in enumerate(_AGGREGATED_METRICS.keys()):
+        row[metric] = bests[i].item()
+        row[f'{metric} (median)'] = medians[i].item()
+        row[f'{metric} (spread)'] = (maxs[i] - mins[i]).item()
+    return row
+
+
+def _nan_quantiles(values, quantiles):
+    """
+    Quantiles over the first axis of a sorted array, ignoring NaNs (which `np.sort` puts last).
+
+    Interpolates linearly like `np.nanquantile`, but without a separate sort per column.
+    """
+    counts = np.sum(~np.isnan(values), axis=0)
+    idx = np.indices(counts.shape)
+    result = {}
+    for name, q in quantiles.items():
+        pos = q * np.maximum(counts - 1, 0)
+        lower, upper = np.floor(pos).astype(int), np.ceil(pos).astype(int)
+        lower_vals, upper_vals = values[(lower, *idx)], values[(upper, *idx)]
+        result[name] = lower_vals + (pos - lower) * (upper_vals - lower_vals)
+    return result
+
+
+def _epoch_bands(epoch_data):
+    """
+    Per-epoch mean and quantile bands over a list of runs.
+
+    All metrics are computed at once on a (metrics, runs, epochs) array that is sorted a single time.
+
+    Parameters
+    ----------
+    epoch_data : list[str]
+        JSON encoded epoch data of the runs (see `utils.load_snapshot`).
+
+    Returns
+    -------
+    dict
+        metric -> {'epoch': [...], 'mean': [...], 'q25': [...], 'q75': [...]}, only containing epochs where at least one
+        run logged the metric.
+    """
+    epoch_data = [{int(ep): vals for ep, vals in json.loads(run).items()} for run in epoch_data]
+    n_epochs = max([0] + [max(run.keys()) + 1 for run in epoch_data if len(run) > 0])
+    metrics = sorted({metric for run in epoch_data for vals in run.values() for metric in vals.keys()})
+    metric_idx = {metric: i for i, metric in enumerate(metrics)}
+
+    values = np.full((len(metrics), len(epoch_data), n_epochs), np.nan)
+    for i, run in enumerate(epoch_data):
+        for ep, vals in run.items():
+            for metric, val in vals.items():
+                if isinstance(val, (int, float)):
+                    values[metric_idx[metric], i, ep] = val
+
+    values = np.sort(values, axis=1)
+    counts = np.sum(~np.isnan(values), axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.nansum(values, axis=1) / counts
+    quantiles = _nan_quantiles(np.moveaxis(values, 1, 0), _BAND_QUANTILES)
+
+    bands = {}
+    for i, metric in enumerate(metrics):
+        logged = counts[i] > 0
+        bands[metric] = {'epoch': np.nonzero(logged)[0].tolist(), 'mean': means[i, logged].tolist()} \
+                        | {name: quantile[i, logged].tolist() for name, quantile in quantiles.items()}
+    return bands
+
+
+def aggregate_runs(df, cache=None):
+    """
+    Aggregate repeated runs of the same model and image resolution.
+
+    Only groups (and taxonomy classes) whose runs changed since the last call with the same `cache` are recomputed.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        One row per run, as returned by `utils.load_snapshot`.
+    cache : dict
+        State kept between calls, created by `_empty_cache`.
+
+    Returns
+    -------
+    tuple[list[dict], dict]
+        One row per group (see `_aggregate_group`), sorted by taxonomy class and model, and the per-epoch bands of each
+        taxonomy class: class -> {'color': str, 'metrics': {metric: band (see `_epoch_bands`)}}.
+    """
+    if cache is None:
+        cache = _empty_cache()
+
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    epoch_hashes = pd.util.hash_pandas_object(df['epoch_data'], index=False).to_numpy()
+    metrics = df[list(_AGGREGATED_METRICS.keys())].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+    groups = {}
+    for i, key in enumerate(_group_keys(df)):
+        groups.setdefault(key, []).append(i)
+
+    group_cache = {}
+    for key, rows in groups.items():
+        rows = np.array(rows)
+        fingerprint = tuple(sorted(row_hashes[rows]))
+        if key in cache['groups'] and cache['groups'][key][0] == fingerprint:
+            group_cache[key] = cache['groups'][key]
+        else:
+            group_cache[key] = (fingerprint, _aggregate_group(key, rows, metrics, df['run date'],
+                                                             df['deviations'].to_numpy()))
+    cache['groups'] = group_cache
+
+    band_cache = {}
+    for tax_class in df['taxonomy class'].unique():
+        rows = np.nonzero((df['taxonomy class'] == tax_class).to_numpy())[0]
+        fingerprint = tuple(sorted(epoch_hashes[rows]))
+        if tax_class in cache['bands'] and cache['bands'][tax_class][0] == fingerprint:
+            band_cache[tax_class] = cache['bands'][tax_class]
+        else:
+            bands = {'color': tx.get_tax_color(tax_class) if tax_class in tx.TAXONOMY else '#000000',
+                     'metrics': _epoch_bands(df['epoch_data'].iloc[rows].tolist())}
+            band_cache[tax_class] = (fingerprint, bands)
+    cache['bands'] = band_cache
+
+    rows = sorted([row for _, row in group_cache.values()], key=lambda row: (row['taxonomy class'], row['model']))
+    return rows, {tax_class: bands for tax_class, (_, bands) in band_cache.items()}
+
+
+def prepare_aggregate_info(file_name=None):
+    """
+    Aggregated counterpart of `utils.prepare_table_info`.
+
+    The result is computed once per snapshot of the data file and shared between callers.
+
+    Returns
+    -------
+    tuple[list[dict], list[dict], dict]
+        Table rows, table columns and per-epoch bands of each taxonomy class.
+    """
+    with _AGGREGATE_LOCK:
+        cache = _AGGREGATE_CACHE.setdefault(file_name, _empty_cache())
+        snapshot = utils.snapshot_hash(file_name)
+        if cache['snapshot'] == snapshot:
+            return cache['result']
+
+        data, bands = aggregate_runs(utils.load_snapshot(file_name), cache=cache)
+        columns = ['model', 'taxonomy class', 'runs']
+        columns += [col for metric in _AGGREGATED_METRICS.keys()
+                    for col in [metric, f'{metric} (median)', f'{metric} (spread)']]
+        columns += ['image resolution (pretraining) [px]', 'image resolution (finetuning) [px]', 'run date']
+        cols = [{'name': c, 'id': c} for c in columns]
+        cache['snapshot'], cache['result'] = snapshot, (data, cols, bands)
+        return data, cols, bands
@@ -1,7 +1,9 @@
 import argparse
-from dash import Dash, html, dcc, dash_table
+from dash import Dash, html, dcc, dash_table, no_update
 import dash_daq as daq
-from utils import prepare_table_info
+from utils import prepare_table_info, derived_metric_names, snapshot_hash, expected_config
+from aggregation import prepare_aggregate_info
+from http_cache import enable_http_cache
 from dash.dependencies import Input, Output, State, ClientsideFunction
 import dash_bootstrap_components as dbc
 import os
@@ -17,6 +19,8 @@ RELOAD_FILE = 'data_tmp.json'
 
 # --------------- Data loading --------------------------------
 tbl_data, tbl_cols, tbl_tooltips = prepare_table_info()
+agg_data, agg_cols, agg_bands = prepare_aggregate_info()
+tbl_hash = snapshot_hash()
 point_metrics = ['throughput [ims/s]']
 point_metrics = sorted(point_metrics)
 
@@ -25,12 +29,18 @@ point_metrics = sorted(point_metrics)
 app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 
 app.title = 'WTF Benchmark'
+# the layout (and with it the initial data) only changes with the snapshot loaded above
+enable_http_cache(app.server, {app.config.routes_pathname_prefix + '_dash-layout': lambda: tbl_hash,
+                               app.config.routes_pathname_prefix + '_dash-dependencies': lambda: tbl_hash},
+                  callback_path=app.config.routes_pathname_prefix + '_dash-update-component')
 app.layout = html.Div([
-    html.H1(f"Which Transformer to Favor: Benchmark", style={'width': '75%', 'display': 'inline-block'}),
+    html.H1(f"Which Transformer to Favor: Benchmark", style={'width': '60%', 'display': 'inline-block'}),
     daq.PowerButton(id='pareto-pwr-btn', label='Pareto front', labelPosition='top',
                     style={'width': '10%', 'display': 'inline-block'}, size=30),
     daq.ToggleSwitch(id='overall-switch', style={'width': '15%', 'display': 'inline-block'},
                      label="overall stats <-> per epoch stats"),
+    daq.ToggleSwitch(id='aggregate-switch', style={'width': '15%', 'display': 'inline-block'},
+                     label="all runs <-> per model"),
     dcc.Graph(id="graph", style={'width': '99vw', 'height': '80vh'}),
     html.Table([html.Tbody([html.Tr([
         html.Td(html.P("x:", style={'display': 'inline-block', 'width': '100%', 'textAlign': 'center', 'lineHeight': '34px', 'fontSize': '1.5rem', 'fontFamily': 'var(--bs-body-font-family)'})),
@@ -40,15 +50,22 @@ app.layout = html.Div([
         html.Td(dcc.Dropdown(id='y-picker', clearable=False, style={'width': '100%', 'display': 'inline-block'},
                      value='top-1 validation accuracy', options=point_metrics))
     ])])], style={'width': '95%', 'margin': '10px'}),
-    dash_table.DataTable(id='run-list', filter_action='native', columns=tbl_cols, data=tbl_data, tooltip=tbl_tooltips,
+    dcc.Checklist(id='deviating-filter', options=[{'label': ' deviating runs only', 'value': 'deviating'}], value=[],
+                  style={'margin': '10px'}),
+    dash_table.DataTable(id='run-list', filter_action='native', columns=tbl_cols, data=[], tooltip=tbl_tooltips,
                          style_table={'overflow': 'scroll', 'width': '100%', 'maxHeight': '100%'}, sort_action='native',
                          fixed_rows={'headers': True}, style_cell={'overflow': 'hidden', 'textOverflow': 'ellipsis'}),
-    dcc.Store(id='highlight-store', data=[]),
-    dcc.Store(id='hidden-runs-store', data={'per epoch': [], 'global': []}),
+    dcc.Store(id='highlight-store', data=''),
+    dcc.Store(id='hidden-runs-store', data={'per epoch': {}, 'global': {}}),
     dcc.Store(id='legend-entries', data=[]),
     dcc.Store(id='graph-layout-store', data={}),
     dcc.Store(id='pareto-right', data=True),
-] + ([dcc.Interval(id='update-data', interval=30*1000, n_intervals=0), dcc.Download('download-data'), html.Button("Download Data as CSV", 'download-btn')]
+    dcc.Store(id='derived-metrics', data=derived_metric_names()),
+    dcc.Store(id='expected-config', data=expected_config()),
+    dcc.Store(id='runs-store', data={'data': tbl_data, 'columns': tbl_cols}),
+    dcc.Store(id='aggregate-store', data={'data': agg_data, 'columns': agg_cols, 'bands': agg_bands}),
+] + ([dcc.Interval(id='update-data', interval=10*1000, n_intervals=0), dcc.Store(id='data-version', data=None),
+       dcc.Download('download-data'), html.Button("Download Data as CSV", 'download-btn')]
                            if RELOAD else [html.H2('Paper'),
     dcc.Markdown('This data was collected for the paper [What Transformer to Favor: A Comparative Analysis of Efficiency in Vision Transformers](https://arxiv.org/abs/2308.09372). '
                  'Have fun playing around with it, and analyzing it deeper. '
@@ -85,11 +102,13 @@ app.clientside_callback(
         Input('pareto-pwr-btn', 'on'),
         Input('pareto-right', 'data'),
         Input('overall-switch', 'value'),
-        Input('highlight-store', 'data')
+        Input('highlight-store', 'data'),
+        Input('aggregate-switch', 'value')
     ],
     state=[
         State('hidden-runs-store', 'data'),
-        State('graph-layout-store', 'data')
+        State('graph-layout-store', 'data'),
+        State('aggregate-store', 'data')
     ],
     output=[
         Output('graph', 'figure'),
@@ -97,6 +116,23 @@ app.clientside_callback(
     ]
 )
 
+app.clientside_callback(
+    ClientsideFunction(
+        namespace='clientside',
+        function_name='table_view'
+    ),
+    inputs=[
+        Input('aggregate-switch', 'value'),
+        Input('deviating-filter', 'value'),
+        Input('runs-store', 'data'),
+        Input('aggregate-store', 'data')
+    ],
+    output=[
+        Output('run-list', 'data'),
+        Output('run-list', 'columns')
+    ]
+)
+
 app.clientside_callback(
     ClientsideFunction(
         namespace='clientside',
@@ -104,10 +140,12 @@ app.clientside_callback(
     ),
     inputs=[
         Input('graph', 'clickData'),
-        Input('run-list', 'active_cell')
+        Input('run-list', 'active_cell'),
+        Input('run-list', 'derived_viewport_data')
     ],
     state=[
-        State('run-list', 'derived_virtual_data')
+        State('highlight-store', 'data'),
+        State('expected-config', 'data')
     ],
     output=[
         Output('highlight-store', 'data'),
@@ -123,6 +161,9 @@ app.clientside_callback(
     inputs=[
         Input('overall-switch', 'value')
     ],
+    state=[
+        State('derived-metrics', 'data')
+    ],
     output=[
         Output('x-picker', 'options'),
         Output('x-picker', 'value'),
@@ -214,14 +255,21 @@ if RELOAD:
     )
 
 if RELOAD:
-    @app.callback([Output('run-list', 'data'), Output('run-list', 'columns')], Input('update-data', 'n_intervals'))
-    def reload_data(n):
+    @app.callback([Output('runs-store', 'data'), Output('aggregate-store', 'data'), Output('data-version', 'data')],
+                  Input('update-data', 'n_intervals'), State('data-version', 'data'))
+    def reload_data(n, client_version):
         while not os.path.isfile(RELOAD_FILE):
             sleep(10)
 
+        version = snapshot_hash(RELOAD_FILE)
+        if version == client_version:
+            # the client already shows this snapshot
+            return no_update, no_update, no_update
+
         data, cols, _ = prepare_table_info(RELOAD_FILE, order_by_date=True, include_run_name=True)
+        aggregates, aggregate_cols, bands = prepare_aggregate_info(RELOAD_FILE)
         logging.info('reloaded data')
-        return data, cols
+        return {'data': data, 'columns': cols}, {'data': aggregates, 'columns': aggregate_cols, 'bands': bands}, version
 
 
 if __name__ == '__main__':
@@ -234,7 +282,7 @@ if __name__ == '__main__':
     try:
         if RELOAD:
             import data_updating
-            load_process = data_updating.start_data_process(n_workers=5, update_interval=30)
+            load_process = data_updating.start_data_process(n_workers=5, update_interval=10, full_update_interval=300)
 
         app.run_server(debug=debug)
     except Exception as ex:
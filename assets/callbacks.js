@@ -4,14 +4,16 @@ if (!window.dash_clientside) {
 
 
 window.dash_clientside.clientside = {
-    update_figure: function(metric_x, metric_y, runs, do_pareto, do_pareto_right, per_epoch, highlight_data, hidden_runs, layout_store) {
+    update_figure: function(metric_x, metric_y, runs, do_pareto, do_pareto_right, per_epoch, highlight_key, aggregate, hidden_runs, layout_store, aggregates) {
         if (runs == null) {
             return [{}, []]
         }
-        if (per_epoch) {
-            data = this.per_epoch_figure(metric_y, runs, highlight_data, hidden_runs['per epoch'])
+        if (per_epoch && aggregate) {
+            data = this.class_band_figure(metric_y, aggregates['bands'], hidden_runs['per epoch'])
+        } else if (per_epoch) {
+            data = this.per_epoch_figure(metric_y, runs, highlight_key, hidden_runs['per epoch'])
         } else {
-            data = this.point_figure(metric_x, metric_y, runs, do_pareto, do_pareto_right, highlight_data, hidden_runs['global'])
+            data = this.point_figure(metric_x, metric_y, runs, do_pareto, do_pareto_right, highlight_key, hidden_runs['global'])
         }
         legendentries = data.map(item => (per_epoch) ? [item['customdata'][0]] : item['customdata'])
         layout = {'xaxis': {'title': {'text': metric_x}}, 'yaxis': {'title': {'text': metric_y}}}
@@ -24,7 +26,7 @@ window.dash_clientside.clientside = {
         return [{'data': data, 'layout': layout}, legendentries]
     },
 
-    per_epoch_figure: function(metric, runs, highlight_data, hidden_runs) {
+    per_epoch_figure: function(metric, runs, highlight_key, hidden_runs) {
         if (runs == null) {
             return {}
         }
@@ -42,21 +44,40 @@ window.dash_clientside.clientside = {
             if (run['image resolution (pretraining) [px]'] != run['image resolution (finetuning) [px]']) {
                 run_name += '->' + run['image resolution (finetuning) [px]']
             }
-            is_highlight = (run['model'] == highlight_data[0] && run['run name'] == highlight_data[1] && run['run date'] == highlight_data[2])
-            linestyle = (is_highlight) ? {'dash': 'dot'} : {}
-            is_hidden = (hidden_runs.some(hidden => hidden['model'] == run['model'] && hidden['run name'] == run['run name'] && hidden['run date'] == run['run date']))
+            linestyle = (run['run key'] == highlight_key) ? {'dash': 'dot'} : {}
             data.push({'x': xs, 'y': ys, 'name': run_name, 'line': linestyle,
-                'customdata': Array(xs.length).fill([run['model'], run['run name'], run['run date']]),
+                'customdata': Array(xs.length).fill(run['run key']),
                 'type': 'scatter', 'hovertext': Array(xs.length).fill(run_name),
                 'hovertemplate': '<b>%{hovertext}</b><br>model=' + run['model'] + '<br>epoch' + '=%{x}<br>' + metric + '=%{y}',
-                'visible': (is_hidden) ? 'legendonly' : true
+                'visible': (run['run key'] in hidden_runs) ? 'legendonly' : true
             })
         }
+        return data
+    },
 
+    class_band_figure: function(metric, bands, hidden_runs) {
+        data = []
+        for (var tax_class in bands) {
+            if (!(metric in bands[tax_class]['metrics'])) {
+                continue
+            }
+            band = bands[tax_class]['metrics'][metric]
+            color = bands[tax_class]['color']
+            visible = (tax_class in hidden_runs) ? 'legendonly' : true
+            customdata = Array(band['epoch'].length).fill(tax_class)
+            data.push({'x': band['epoch'], 'y': band['q75'], 'type': 'scatter', 'mode': 'lines', 'line': {'width': 0, 'color': color},
+                'legendgroup': tax_class, 'showlegend': false, 'hoverinfo': 'skip', 'customdata': customdata, 'visible': visible})
+            data.push({'x': band['epoch'], 'y': band['q25'], 'type': 'scatter', 'mode': 'lines', 'line': {'width': 0, 'color': color},
+                'fill': 'tonexty', 'fillcolor': color + '33', 'legendgroup': tax_class, 'showlegend': false, 'hoverinfo': 'skip',
+                'customdata': customdata, 'visible': visible})
+            data.push({'x': band['epoch'], 'y': band['mean'], 'type': 'scatter', 'mode': 'lines', 'line': {'color': color},
+                'name': tax_class, 'legendgroup': tax_class, 'customdata': customdata,
+                'hovertemplate': '<b>' + tax_class + '</b><br>epoch=%{x}<br>' + metric + ' (mean)=%{y}', 'visible': visible})
+        }
         return data
     },
 
-    point_figure: function(metric_x, metric_y, runs, do_pareto, do_pareto_right, highlight_data, hidden_runs){
+    point_figure: function(metric_x, metric_y, runs, do_pareto, do_pareto_right, highlight_key, hidden_runs){
         if (runs == null) {
             return {}
         }
@@ -78,23 +99,22 @@ window.dash_clientside.clientside = {
             }
             marker = 'circle'
             group = model
-            if (highlight_data.length > 0 && model == highlight_data[0] && run['run name'] == highlight_data[1] && run['run date'] == highlight_data[2]) {
+            if (run['run key'] == highlight_key) {
                 group = model + '!'
                 marker = 'x'
             }
             if ((!group in grouped_runs) || grouped_runs[group] == null) {
-                is_hidden = (hidden_runs.some(hidden => hidden['model'] == model && hidden['run name'] == run['run name'] && hidden['run date'] == run['run date']))
                 grouped_runs[group] = {'x': [run[metric_x]], 'y': [run[metric_y]], 'type': 'scatter', 'name': group,
-                                       'mode': 'markers', 'hovertext': [hovertext], 'customdata': [[model, run['run name'], run['run date']]],
+                                       'mode': 'markers', 'hovertext': [hovertext], 'customdata': [run['run key']],
                                        'hovertemplate': '<b>%{hovertext}</b><br>model=' + model + '<br>' + metric_x + '=%{x}<br>' + metric_y + '=%{y}',
-                                       'marker': {'symbol': marker}, 'visible': (is_hidden) ? 'legendonly' : true
+                                       'marker': {'symbol': marker}, 'visible': (run['run key'] in hidden_runs) ? 'legendonly' : true
                 }
 
             } else {
                 grouped_runs[group]['x'].push(run[metric_x])
                 grouped_runs[group]['y'].push(run[metric_y])
                 grouped_runs[group]['hovertext'].push(hovertext)
-                grouped_runs[group]['customdata'].push([model, run['run name'], run['run date']])
+                grouped_runs[group]['customdata'].push(run['run key'])
             }
             vals.push([run[metric_x], run[metric_y]])
         }
@@ -151,40 +171,63 @@ window.dash_clientside.clientside = {
         return data
     },
 
-    set_highlight: function(graph_click, table_cell, table_data) {
-        default_styling = this.default_conditional_styling()
-        if (graph_click == null && table_cell == null) {
-            return [[], default_styling]
+    table_view: function(aggregate, deviating_filter, runs, aggregates) {
+        view = (aggregate) ? aggregates : runs
+        data = view['data']
+        if (deviating_filter != null && deviating_filter.includes('deviating')) {
+            data = data.filter(run => run['deviations'] > 0)
         }
-        highlight_run_data = []
+        return [data, view['columns']]
+    },
+
+    set_highlight: function(graph_click, table_cell, table_data, highlight_key, expected_config) {
+        default_styling = this.deviation_styling(table_data, expected_config)
         trigger = window.dash_clientside.callback_context.triggered[0]['prop_id']
-        if (trigger.includes('graph')) {
-            highlight_run_data = graph_click.points[0]['customdata']
-        } else {
-            highlight_run_data = [table_data[table_cell.row].model, table_data[table_cell.row]['run name'], table_data[table_cell.row]['run date']]
+        new_highlight_key = highlight_key
+        if (trigger.includes('clickData') && graph_click != null && graph_click.points[0]['customdata'] != null) {
+            new_highlight_key = graph_click.points[0]['customdata']
+        } else if (trigger.includes('active_cell') && table_cell != null && table_data != null) {
+            new_highlight_key = table_data[table_cell.row]['run key']
+        }
+        if (new_highlight_key != null && new_highlight_key != '' && table_data != null) {
+            // the rows shown changed (sorting, filtering, ...) or a new run got highlighted
+            row = table_data.findIndex(run => run['run key'] == new_highlight_key)
+            if (row >= 0) {
+                default_styling.push({'if': {'row_index': row}, 'backgroundColor': '#D3D3D3'})
+                default_styling.push({'if': {'state': 'selected', 'row_index': row}, 'backgroundColor': '#D3D3D3', 'border': 'inherit !important'})
+            }
         }
-        default_styling.push({'if': {'filter_query': '{run name} = "' + highlight_run_data[1] + '" && {run date} = ' + highlight_run_data[2]}, 'backgroundColor': '#D3D3D3'})
-        default_styling.push({'if': {'state': 'selected', 'filter_query': '{run name} = "' + highlight_run_data[1] + '" && {run date} = ' + highlight_run_data[2]}, 'backgroundColor': '#D3D3D3', 'border': 'inherit !important'})
-        return [highlight_run_data, default_styling]
+        highlight_output = (new_highlight_key == highlight_key) ? window.dash_clientside.no_update : new_highlight_key
+        return [highlight_output, default_styling]
     },
 
-    default_conditional_styling: function () {
-        return [
-            {'if': {'column_id': 'image resolution (pretraining) [px]', 'filter_query': '{image resolution (pretraining) [px]} != 224'}, 'fontWeight': 'bold', 'color': 'tomato'},
-            {'if': {'column_id': 'image resolution (finetuning) [px]', 'filter_query': '{image resolution (finetuning) [px]} != 224'}, 'fontWeight': 'bold', 'color': 'tomato'},
-            {'if': {'column_id': 'GPUS (pretraining)', 'filter_query': '{GPUS (pretraining)} != 4'}, 'fontWeight': 'bold', 'color': 'tomato'},
-            {'if': {'column_id': 'GPUS (finetuning)', 'filter_query': '{GPUS (finetuning)} != 4'}, 'fontWeight': 'bold', 'color': 'tomato'},
-            {'if': {'column_id': 'dataloader workers (pretraining)', 'filter_query': '{dataloader workers (pretraining)} != 44'}, 'fontWeight': 'bold', 'color': 'tomato'},
-            {'if': {'column_id': 'dataloader workers (finetuning)', 'filter_query': '{dataloader workers (finetuning)} != 44'}, 'fontWeight': 'bold', 'color': 'tomato'},
-            {'if': {'column_id': 'lr (pretraining)', 'filter_query': '{lr (pretraining)} != 3e-3'}, 'fontWeight': 'bold', 'color': 'tomato'},
-            {'if': {'column_id': 'lr (finetuning)', 'filter_query': '{lr (finetuning)} = 3e-4'}, 'fontWeight': 'bold', 'color': 'green'},
-            {'if': {'column_id': 'lr (finetuning)', 'filter_query': '{lr (finetuning)} != 3e-4'}, 'fontWeight': 'bold', 'color': 'tomato'},
-            {'if': {'column_id': 'optimizer eps', 'filter_query': '{optimizer eps} != 1e-7'}, 'fontWeight': 'bold', 'color': 'tomato'},
-            {'if': {'state': 'selected'}, 'backgroundColor': 'white', 'border': 'inherit !important'},
-        ]
+    deviation_styling: function(table_data, expected_config) {
+        // mark cells from the precomputed deviation flags (see utils.deviation_flags)
+        styling = []
+        if (table_data != null) {
+            expected_config['columns'].forEach((column, bit) => {
+                deviating_rows = []
+                expected_rows = []
+                table_data.forEach((run, row) => {
+                    if ((run['deviations'] >> bit) & 1) {
+                        deviating_rows.push(row)
+                    } else if (run[column] != null) {
+                        expected_rows.push(row)
+                    }
+                })
+                if (deviating_rows.length > 0) {
+                    styling.push({'if': {'column_id': column, 'row_index': deviating_rows}, 'fontWeight': 'bold', 'color': 'tomato'})
+                }
+                if (expected_config['mark_expected'].includes(column) && expected_rows.length > 0) {
+                    styling.push({'if': {'column_id': column, 'row_index': expected_rows}, 'fontWeight': 'bold', 'color': 'green'})
+                }
+            })
+        }
+        styling.push({'if': {'state': 'selected'}, 'backgroundColor': 'white', 'border': 'inherit !important'})
+        return styling
     },
 
-    picker_options: function (per_epoch) {
+    picker_options: function (per_epoch, derived_metrics) {
         point_metrics = ['image resolution (pretraining) [px]', 'GPUS (pretraining)', 'lr (pretraining)',
                  'image resolution (finetuning) [px]', 'GPUs (finetuning)', 'lr (finetuning)',
                  'inference VRAM @32 [GB]', 'inference VRAM @128 [GB]', 'inference VRAM @1 [GB]', 'inference VRAM @64 [GB]',
@@ -204,7 +247,7 @@ window.dash_clientside.clientside = {
             per_epoch_metrics = per_epoch_metrics.sort((a, b) => a.localeCompare(b))
             return [['epoch'], 'epoch', per_epoch_metrics, 'top-1 validation accuracy']
         }
-        point_metrics = point_metrics.sort((a, b) => a.localeCompare(b))
+        point_metrics = point_metrics.concat(derived_metrics).sort((a, b) => a.localeCompare(b))
         return [point_metrics, 'throughput [ims/s]', point_metrics, 'top-1 validation accuracy']
     },
 
@@ -215,23 +258,19 @@ window.dash_clientside.clientside = {
 
     hidden_items_store: function(restyle_data, hidden_store_state, legend_entries, per_epoch) {
         if (restyle_data == null) {
-            return {'per epoch': [], 'global': []}
+            return {'per epoch': {}, 'global': {}}
         }
         if (per_epoch == null) {
             per_epoch = false
         }
-        hidden_state_first_level_key = (per_epoch) ? 'per epoch' : 'global'
+        hidden_keys = hidden_store_state[(per_epoch) ? 'per epoch' : 'global']
         for (var run_i in restyle_data[1]) {
             hide_runs = (restyle_data[0].visible[run_i] == 'legendonly')
-            for (var run_data in legend_entries[restyle_data[1][run_i]]) {
-                run_data = legend_entries[restyle_data[1][run_i]][run_data]
-                run_data = {'model': run_data[0], 'run name': run_data[1], 'run date': run_data[2]}
+            for (var run_key of legend_entries[restyle_data[1][run_i]] || []) {
                 if (hide_runs) {
-                    hidden_store_state[hidden_state_first_level_key].push(run_data)
+                    hidden_keys[run_key] = true
                 } else {
-                    hidden_store_state[hidden_state_first_level_key] = hidden_store_state[hidden_state_first_level_key]
-                        .filter(hidden_data => Object.keys(run_data)
-                            .some(key => run_data[key] != hidden_data[key]))
+                    delete hidden_keys[run_key]
                 }
             }
         }
@@ -287,8 +326,7 @@ window.dash_clientside.clientside = {
         if (n_clicks == null || n_clicks < 1) {
             return window.dash_clientside.no_update
         }
-        keys = Object.keys(data[0])
-        keys.pop()
+        keys = Object.keys(data[0]).filter(key => !['epoch_data', 'run key', 'deviations'].includes(key))
         return_string = keys.join(';') + '\n'
         for (var run in data) {
             run = data[run]
@@ -1,11 +1,96 @@
+import io
 import json
 import os
+import queue
 import re
 from time import time, sleep
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing import Pool, Process
+from threading import Event, Thread
+import numpy as np
+
+
+def _to_epoch_arrays(epoch_data):
+    """
+    Pack per-epoch values into one contiguous float array per metric.
+
+    Parameters
+    ----------
+    epoch_data : dict
+        Mapping of epoch number -> {metric: value}, as parsed from the log.
+
+    Returns
+    -------
+    dict
+        `first_epoch` (int), `metrics` ({metric: np.ndarray}, where index i holds epoch first_epoch + i and missing
+        values are NaN), `logged` ({metric: np.ndarray of bool}, whether the value was logged, as the log itself can
+        contain NaN values) and `other` ({epoch: {metric: value}} for values that are not numbers).
+    """
+    epochs = {'first_epoch': 0, 'metrics': {}, 'logged': {}, 'other': {}}
+    if len(epoch_data) == 0:
+        return epochs
+    first_epoch = epochs['first_epoch'] = min(epoch_data.keys())
+    n_epochs = max(epoch_data.keys()) - first_epoch + 1
+    for epoch, ep_data in epoch_data.items():
+        for key, val in ep_data.items():
+            if isinstance(val, (int, float)) and not isinstance(val, bool):
+                if key not in epochs['metrics']:
+                    epochs['metrics'][key] = np.full(n_epochs, np.nan)
+                    epochs['logged'][key] = np.zeros(n_epochs, dtype=bool)
+                epochs['metrics'][key][epoch - first_epoch] = val
+                epochs['logged'][key][epoch - first_epoch] = True
+            else:
+                epochs['other'].setdefault(epoch, {})[key] = val
+    return epochs
+
+
+def _num_epochs(epochs):
+    if len(epochs['metrics']) > 0:
+        return len(next(iter(epochs['metrics'].values())))
+    if len(epochs['other']) > 0:
+        return max(epochs['other'].keys()) - epochs['first_epoch'] + 1
+    return 0
+
+
+def _epoch_row(epochs, idx):
+    row = {key: vals[idx].item() for key, vals in epochs['metrics'].items() if epochs['logged'][key][idx]}
+    epoch = epochs['first_epoch'] + (idx if idx >= 0 else _num_epochs(epochs) + idx)
+    return row | epochs['other'].get(epoch, {})
+
+
+def epoch_data_to_dict(epochs):
+    """
+    Convert the array-backed epoch storage of `extract_run_data` back into the {epoch: {metric: value}} layout.
+
+    Epochs without any value are left out.
+    """
+    epoch_data = {}
+    for idx in range(_num_epochs(epochs)):
+        row = _epoch_row(epochs, idx)
+        if len(row) > 0:
+            epoch_data[epochs['first_epoch'] + idx] = row
+    return epoch_data
+
+
+def _masked_cumsum(vals, logged):
+    # running sum over the logged epochs, epochs without a value stay NaN; a logged NaN carries over like in a sum
+    return np.where(logged, np.cumsum(np.where(logged, vals, 0.)), np.nan)
+
+
+def _nanmax(vals):
+    # max of the logged values, but at least 0 (like max([0.] + vals))
+    if np.all(np.isnan(vals)):
+        return 0.
+    return max(0., np.nanmax(vals).item())
 
 
 def extract_run_data(logfile, max_infors_per_line=10):
+    with open(logfile, 'r') as f:
+        content = f.read()
+    return parse_run_log(content, logfile, max_infors_per_line=max_infors_per_line)
+
+
+def parse_run_log(content, logfile, max_infors_per_line=10):
     device_re = re.compile("INFO: training on (.*) -> (.*)\n")
     args_re = re.compile("INFO: full set of arguments: (.*)\n")
     old_args_re = re.compile("INFO: full set of old arguments: (.*)\n")
@@ -18,10 +103,7 @@ def extract_run_data(logfile, max_infors_per_line=10):
             max_infors_per_line - 1) * "(?:, ([^=]*)=([^=,]*))?" + "\n")
     eff_metrics_json_re = re.compile("INFO: (?:Efficiency m|M)etrics: (.*)\n")
 
-    lines = []
-    with open(logfile, 'r') as f:
-        for line in f:
-            lines.append(line)
+    lines = io.StringIO(content)
 
     run_data = {"epoch_data": {}}
     for line in lines:
@@ -137,50 +219,39 @@ def extract_run_data(logfile, max_infors_per_line=10):
             #     print(f"new vals: {efficiency_data} -> into dict: {run_data['throughput']}")
             continue
 
+    # pack the per-epoch values into one float array per metric
+    epochs = _to_epoch_arrays(run_data['epoch_data'])
+    run_data['epoch_data'] = epochs
+    metrics, logged = epochs['metrics'], epochs['logged']
+
     # make times to be GPU seconds
     num_gpus = run_data['world_size'] if 'world_size' in run_data else -1
-    for epoch in run_data['epoch_data'].values():
-        for key in epoch.keys():
-            if 'time' in key:
-                epoch[key] = num_gpus * epoch[key]
+    for key in metrics.keys():
+        if 'time' in key:
+            metrics[key] *= num_gpus
 
     # calculate time sums and correct some typos...
-    train_time_sum = val_time_sum = 0.
-    epochs = sorted(run_data['epoch_data'].keys())
-    for ep_n in epochs:
-        ep = run_data['epoch_data'][ep_n]
-        if 'time' in ep:
-            train_time_sum += ep['time']
-            ep['time_sum'] = train_time_sum
-        if 'validation_time' in ep:
-            val_time_sum += ep['validation_time']
-            ep['validation_time_sum'] = val_time_sum
-        if 'validataion_accuracy' in ep:
-            ep['val_acc1'] = ep['validataion_accuracy']
-            ep.pop('validataion_accuracy')
+    for key in ['time', 'validation_time']:
+        if key in metrics:
+            metrics[f'{key}_sum'] = _masked_cumsum(metrics[key], logged[key])
+            logged[f'{key}_sum'] = logged[key].copy()
+    if 'validataion_accuracy' in metrics:
+        typo, typo_logged = metrics.pop('validataion_accuracy'), logged.pop('validataion_accuracy')
+        val_acc = metrics.get('val_acc1', np.full_like(typo, np.nan))
+        metrics['val_acc1'] = np.where(typo_logged, typo, val_acc)
+        logged['val_acc1'] = typo_logged | logged.get('val_acc1', typo_logged)
 
     # if accuracy is accidentally *10_000 instead of *100, correct that shit
-    acc_list = [0.] + [ep['acc1'] for ep in run_data['epoch_data'].values() if 'acc1' in ep]
-    max_acc = max(acc_list)
-    if max_acc > 1.:
-        # accuracy is too high by a factor of 100
-        for ep in run_data['epoch_data'].values():
-            if 'acc1' in ep:
-                ep['acc1'] = ep['acc1'] / 100
-
-    acc_val_list = [0.] + [ep['val_acc1'] for ep in run_data['epoch_data'].values() if 'val_acc1' in ep]
-    max_acc_val = max(acc_val_list)
-    if max_acc_val > 1.:
-        for ep in run_data['epoch_data'].values():
-            if 'val_acc1' in ep:
-                ep['val_acc1'] = ep['val_acc1'] / 100
-    # run_data['epoch_data'] = json.dumps(run_data['epoch_data'])
+    for key in ['acc1', 'val_acc1']:
+        if key in metrics and _nanmax(metrics[key]) > 1.:
+            # accuracy is too high by a factor of 100
+            metrics[key] /= 100
 
     # final epoch data extraction
-    if len(run_data['epoch_data']) > 0:
-        final_epoch = run_data['epoch_data'][max(run_data['epoch_data'].keys())]
+    if len(metrics) > 0 or len(epochs['other']) > 0:
+        final_epoch = _epoch_row(epochs, -1)
         run_data = run_data | {f"final_{key}": val for key, val in final_epoch.items()}
-        run_data['final_epoch'] = max(run_data['epoch_data'].keys())
+        run_data['final_epoch'] = epochs['first_epoch'] + _num_epochs(epochs) - 1
 
     # collapse throughput dict
     if 'throughput' in run_data:
@@ -189,11 +260,10 @@ def extract_run_data(logfile, max_infors_per_line=10):
         run_data.pop('throughput')
 
     # best epoch data extraction
-    if len(run_data['epoch_data']) > 0:
-        keys = set(run_data['epoch_data'][min(run_data['epoch_data'].keys())]).union(set(run_data['epoch_data'][max(run_data['epoch_data'].keys())]))
-        for key in keys:
-            if 'acc' in key:
-                run_data['top_'+key] = max([0.] + [run[key] for run in run_data['epoch_data'].values() if key in run])
+    if len(metrics) > 0:
+        for key, vals in metrics.items():
+            if 'acc' in key and (logged[key][0] or logged[key][-1]):
+                run_data['top_'+key] = _nanmax(vals)
 
     if 'world_size' in run_data and 'batch_size' in run_data:
         run_data['local_batch_size'] = run_data['batch_size']
@@ -210,21 +280,207 @@ log_folder = "/netscratch/nauen/EfficientCVBench/logging/"
 data_file_name = "data_tmp.json"
 
 
-def _data_process(n_workers, update_interval):
-    while True:
-        start = time()
-        logfiles = [log_folder + f.split('/')[-1] for f in os.listdir(log_folder) if f.endswith('.log')]
-        with Pool(n_workers) as p:
-            runs = p.map(extract_run_data, logfiles)
-        runs = [run for run in runs if 'run_name' in run and run['run_name'] is not None and len(run['run_name']) > 0]
-        with open('data.tmp', "w+") as f:
-            json.dump(runs, f)
-        os.replace('data.tmp', data_file_name)
-        sleep_time = max(update_interval - time() + start, 0)
-        sleep(sleep_time)
+def list_logs(folder):
+    with os.scandir(folder) as entries:
+        return sorted(entry.path for entry in entries if entry.name.endswith('.log') and entry.is_file())
+
+
+def scan_logs(folder, n_io_threads=16, list_fn=list_logs, stat_fn=os.stat):
+    """
+    Collect the log files in a folder together with their stats.
+
+    The stat calls are issued concurrently, as each of them is a round trip on a network filesystem.
+
+    Returns
+    -------
+    list[tuple[str, os.stat_result]]
+        (path, stat) for every `.log` file, sorted by path.
+    """
+    def _stat(path):
+        try:
+            return path, stat_fn(path)
+        except OSError:
+            # deleted since listing the folder
+            return path, None
 
+    with ThreadPoolExecutor(n_io_threads) as executor:
+        logs = executor.map(_stat, list_fn(folder))
+        return [(path, stat) for path, stat in logs if stat is not None]
 
-def start_data_process(n_workers=5, update_interval=10):
-    data_process = Process(target=_data_process, args=(n_workers, update_interval, ))
+
+def read_log(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+
+def _read_logs(paths, read_fn, n_io_threads, queue_size):
+    """
+    Read files concurrently in a thread pool and yield (path, content) as they arrive.
+
+    At most `n_io_threads + queue_size` files are held in memory ahead of the consumer. Files that can not be read
+    (e.g. deleted after scanning) are skipped. If the consumer stops early (e.g. because parsing a file raised), the
+    remaining reads are dropped, so that no reader thread is left blocked on the full queue.
+    """
+    done = object()
+    contents = queue.Queue(maxsize=queue_size)
+    stop = Event()
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                contents.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _reader(path):
+        if stop.is_set():
+            return
+        try:
+            _put((path, read_fn(path)))
+        except (OSError, UnicodeDecodeError) as err:
+            print(f"{type(err).__name__} {err}\n\t when trying to read {path}")
+
+    def _feeder():
+        with ThreadPoolExecutor(n_io_threads) as executor:
+            for path in paths:
+                if stop.is_set():
+                    break
+                executor.submit(_reader, path)
+        _put(done)
+
+    Thread(target=_feeder, daemon=True).start()
+    try:
+        while (item := contents.get()) is not done:
+            yield item
+    finally:
+        stop.set()
+
+
+def _parse_log_item(item):
+    path, content = item
+    return path, parse_run_log(content, path)
+
+
+def ingest_logs(folder, pool, n_io_threads=16, queue_size=64, list_fn=list_logs, read_fn=read_log):
+    """
+    Parse all logs in a folder with a two-stage pipeline.
+
+    The I/O stage lists the folder and reads the files with `n_io_threads` threads, the CPU stage parses the contents
+    in the worker processes of `pool` as soon as they have been read.
+
+    Parameters
+    ----------
+    folder : str
+        Folder containing the `.log` files.
+    pool : multiprocessing.pool.Pool
+        Pool of parse workers.
+    n_io_threads : int
+        Number of concurrent reads.
+    queue_size : int
+        Number of read files that may wait for a parse worker.
+    list_fn, read_fn : callable
+        File layer, see `list_logs` and `read_log`.
+
+    Returns
+    -------
+    list[dict]
+        The parsed runs, in order of their log paths.
+    """
+    runs = parse_logs(list_fn(folder), pool, n_io_threads=n_io_threads, queue_size=queue_size, read_fn=read_fn)
+    return [runs[path] for path in sorted(runs)]
+
+
+def parse_logs(paths, pool, n_io_threads=16, queue_size=64, read_fn=read_log):
+    """
+    Read and parse the given logs with the pipeline of `ingest_logs`.
+
+    The files are read in the order of `paths`, so the first ones are parsed first.
+
+    Returns
+    -------
+    dict
+        log path -> parsed run
+    """
+    contents = _read_logs(paths, read_fn, n_io_threads, queue_size)
+    return dict(pool.imap_unordered(_parse_log_item, contents))
+
+
+def _stat_version(stat):
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _update_cache(cache, logs, runs):
+    """
+    Store freshly parsed runs in the cache of `_data_process` and return whether any of them changed.
+
+    Runs are stored as JSON in the data file layout (or None if they have no run name), so publishing a snapshot
+    only needs to join them.
+    """
+    changed = False
+    for path, run in runs.items():
+        if 'run_name' in run and run['run_name'] is not None and len(run['run_name']) > 0:
+            run['epoch_data'] = epoch_data_to_dict(run['epoch_data'])
+            run = json.dumps(run)
+        else:
+            run = None
+        changed = changed or path not in cache or cache[path][1] != run
+        cache[path] = (_stat_version(logs[path]), run)
+    return changed
+
+
+def _publish(cache, file_name):
+    runs = [cache[path][1] for path in sorted(cache) if cache[path][1] is not None]
+    with open('data.tmp', "w+") as f:
+        f.write('[' + ', '.join(runs) + ']')
+    os.replace('data.tmp', file_name)
+
+
+def _data_process(n_workers, update_interval, n_io_threads, queue_size, full_update_interval, active_window):
+    """
+    Keep the data file up to date with the logs.
+
+    Every `update_interval` seconds, the logs modified within the last `active_window` seconds (i.e. the runs that are
+    still training) are parsed, most recently modified first, and a snapshot with these fresh runs and the cached
+    other runs is published right away. Every `full_update_interval` seconds, the other logs that are new or changed
+    since they were last parsed are refreshed as well.
+
+    Nothing is published before the first full refresh filled the cache, so that a restart doesn't replace the
+    complete data file of the previous process with a snapshot of the active runs only.
+    """
+    cache = {}  # log path -> ((mtime, size), run as JSON or None)
+    complete = False  # whether the cache holds every log
+    last_full_update = -float('inf')
+    with Pool(n_workers) as p:
+        while True:
+            start = time()
+            logs = dict(scan_logs(log_folder, n_io_threads=n_io_threads))
+            removed = set(cache.keys()).difference(logs.keys())
+            for path in removed:
+                cache.pop(path)
+
+            ranked = sorted(logs.keys(), key=lambda path: logs[path].st_mtime, reverse=True)
+            active = [path for path in ranked if start - logs[path].st_mtime < active_window]
+            runs = parse_logs(active, p, n_io_threads=n_io_threads, queue_size=queue_size)
+            if (_update_cache(cache, logs, runs) or len(removed) > 0) and complete:
+                _publish(cache, data_file_name)
+
+            if start - last_full_update >= full_update_interval:
+                finished = [path for path in ranked[len(active):]
+                            if path not in cache or cache[path][0] != _stat_version(logs[path])]
+                runs = parse_logs(finished, p, n_io_threads=n_io_threads, queue_size=queue_size)
+                if _update_cache(cache, logs, runs) or not complete:
+                    _publish(cache, data_file_name)
+                complete = True
+                last_full_update = start
+
+            sleep_time = max(update_interval - time() + start, 0)
+            sleep(sleep_time)
+
+
+def start_data_process(n_workers=5, update_interval=10, n_io_threads=16, queue_size=64, full_update_interval=300,
+                       active_window=3600):
+    data_process = Process(target=_data_process, args=(n_workers, update_interval, n_io_threads, queue_size,
+                                                       full_update_interval, active_window, ))
     data_process.start()
     return data_process
@@ -0,0 +1,172 @@
+"""
+Batch renderer for publication-style scatter plots of a data snapshot.
+
+Every figure is described by a spec (x metric, y metric, Pareto front on/off). Markers, colors and legend order
+come from `taxonomy`. Figures are rendered in a process pool; a figure is only re-rendered if its spec or the data it
+shows changed since the last run, which is tracked by a content hash in the index file of the output folder.
+
+Example:
+    python3 figures.py -specs specs.json -out figures
+with specs.json containing e.g.
+    [["throughput [ims/s]", "top-1 validation accuracy", true], ["GFLOPs", "top-1 validation accuracy", false]]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+from multiprocessing import Pool
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib import pyplot as plt
+import numpy as np
+import taxonomy as tx
+import utils
+
+# bump to re-render all figures after changing the plotting code
+_RENDER_VERSION = 1
+_INDEX_FILE = 'index.json'
+
+
+def parse_spec(spec):
+    """
+    Normalize a spec given as [x, y, pareto] or {'x': ..., 'y': ..., 'pareto': ...}.
+    """
+    if isinstance(spec, dict):
+        return {'x': spec['x'], 'y': spec['y'], 'pareto': bool(spec.get('pareto', False))}
+    x, y = spec[0], spec[1]
+    return {'x': x, 'y': y, 'pareto': bool(spec[2]) if len(spec) > 2 else False}
+
+
+def _file_stem(spec):
+    stem = f"{spec['y']} vs {spec['x']}" + (" pareto" if spec['pareto'] else "")
+    return re.sub(r'[^A-Za-z0-9@\-]+', '_', stem).strip('_')
+
+
+def _figure_data(df, spec):
+    data = df[['model', spec['x'], spec['y']]].dropna()
+    data = data[(data[spec['x']] >= 0) & (data[spec['y']] >= 0)]
+    return {'model': data['model'].tolist(), 'x': data[spec['x']].astype(float).tolist(),
+            'y': data[spec['y']].astype(float).tolist()}
+
+
+def _content_hash(spec, data, fmt):
+    content = json.dumps({'version': _RENDER_VERSION, 'spec': spec, 'data': data, 'format': fmt}, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def pareto_front(xs, ys, higher_x_is_better):
+    """
+    Points of the Pareto front, where higher y values are better.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        x and y values of the front, sorted by x.
+    """
+    order = np.argsort(-xs if higher_x_is_better else xs, kind='stable')
+    best_y = np.maximum.accumulate(ys[order])
+    on_front = np.concatenate([[True], best_y[1:] > best_y[:-1]])
+    front = order[on_front]
+    front = front[np.argsort(xs[front])]
+    return xs[front], ys[front]
+
+
+def render_figure(spec, data, file_name):
+    """
+    Render one scatter plot with the taxonomy markers and colors to `file_name`.
+    """
+    fig, ax = plt.subplots(figsize=(8, 5))
+    models = np.array(data['model'])
+    xs, ys = np.array(data['x']), np.array(data['y'])
+    with utils.no_print():
+        for model in sorted(set(data['model']), key=tx.get_legend_order):
+            is_model = models == model
+            ax.scatter(xs[is_model], ys[is_model], label=model, marker=tx.get_marker(model),
+                       color=tx.get_tax_color(model), edgecolors=tx.get_edge_color(model), linewidths=0.5, s=40,
+                       zorder=3)
+
+    if spec['pareto'] and len(xs) > 0:
+        # like the pareto_right callback of the website: more throughput is better, less of anything else
+        front_x, front_y = pareto_front(xs, ys, higher_x_is_better='throughput' in spec['x'].lower())
+        ax.step(front_x, front_y, where='pre' if 'throughput' in spec['x'].lower() else 'post', color='black',
+                linestyle='--', linewidth=1, label='Pareto front', zorder=2)
+
+    ax.set_xlabel(spec['x'])
+    ax.set_ylabel(spec['y'])
+    ax.grid(alpha=0.3)
+    ax.legend(loc='center left', bbox_to_anchor=(1.01, 0.5), fontsize='x-small', frameon=False)
+    fig.savefig(file_name, bbox_inches='tight', dpi=300)
+    plt.close(fig)
+    return file_name
+
+
+def _render_job(job):
+    return render_figure(*job)
+
+
+def render_figures(specs, file_name=None, out_dir='figures', n_workers=4, fmt='png'):
+    """
+    Render all figures of `specs` for a data snapshot and write an index of them.
+
+    Parameters
+    ----------
+    specs : list
+        Figure specs, see `parse_spec`.
+    file_name : str
+        Data file (default: data/data.json).
+    out_dir : str
+        Folder for the images and the index file.
+    n_workers : int
+        Number of rendering processes.
+    fmt : str
+        Image format, e.g. 'png' or 'pdf'.
+
+    Returns
+    -------
+    list[dict]
+        The index: x, y, pareto, file, hash, number of runs and whether the figure was (re-)rendered, per spec.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    index_file = os.path.join(out_dir, _INDEX_FILE)
+    old_hashes = {}
+    if os.path.isfile(index_file):
+        with open(index_file, 'r') as f:
+            old_hashes = {entry['file']: entry['hash'] for entry in json.load(f)}
+
+    df = utils.load_snapshot(file_name)
+    index, jobs = [], []
+    for spec in map(parse_spec, specs):
+        data = _figure_data(df, spec)
+        content_hash = _content_hash(spec, data, fmt)
+        image = f"{_file_stem(spec)}.{fmt}"
+        changed = old_hashes.get(image) != content_hash or not os.path.isfile(os.path.join(out_dir, image))
+        if changed:
+            jobs.append((spec, data, os.path.join(out_dir, image)))
+        index.append(spec | {'file': image, 'hash': content_hash, 'runs': len(data['x']), 'rendered': changed})
+
+    if len(jobs) > 0:
+        with Pool(min(n_workers, len(jobs))) as p:
+            p.map(_render_job, jobs)
+
+    with open(index_file + '.tmp', 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(index_file + '.tmp', index_file)
+    return index
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-specs', required=True, help='JSON file with a list of [x, y, pareto] specs')
+    parser.add_argument('-data', default=None, help='data snapshot (default: data/data.json)')
+    parser.add_argument('-out', default='figures', help='output folder')
+    parser.add_argument('-workers', type=int, default=4, help='number of rendering processes')
+    parser.add_argument('-format', default='png', help='image format (png, pdf, svg, ...)')
+    args = parser.parse_args()
+
+    with open(args.specs, 'r') as f:
+        figure_specs = json.load(f)
+    figure_index = render_figures(figure_specs, file_name=args.data, out_dir=args.out, n_workers=args.workers,
+                                  fmt=args.format)
+    print(f"rendered {sum(entry['rendered'] for entry in figure_index)} of {len(figure_index)} figures, "
+          f"index: {os.path.join(args.out, _INDEX_FILE)}")
@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import g, request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# path -> {'version': ..., 'etag': str, 'mimetype': str, 'bodies': {encoding: bytes}}, see enable_http_cache
+_GET_CACHE = {}
+# path -> lock held while the response of the path is rendered and compressed, so that concurrent cold requests
+# don't all render it
+_GET_LOCKS = {}
+
+# sha256 of an uncompressed callback response -> {encoding: bytes}
+_CALLBACK_BODIES = OrderedDict()
+_MAX_CALLBACK_BODIES = 8
+
+# bodies smaller than this are not worth compressing
+_MIN_COMPRESS_SIZE = 1024
+# quality 11 takes >10s for the full run table, 9 is within a few percent of gzip -9's time
+_BROTLI_QUALITY = 9
+
+
+def _compress(body):
+    bodies = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9)}
+    if brotli is not None:
+        bodies['br'] = brotli.compress(body, quality=_BROTLI_QUALITY)
+    return bodies
+
+
+def _negotiate(bodies):
+    encoding = request.accept_encodings.best_match([enc for enc in ['br', 'gzip'] if enc in bodies])
+    return encoding if encoding is not None else 'identity'
+
+
+def _set_body(response, bodies, encoding):
+    response.set_data(bodies[encoding])
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _cached_response(entry):
+    # each representation gets its own strong ETag, they are not byte-identical
+    encoding = _negotiate(entry['bodies'])
+    etag = entry['etag'] if encoding == 'identity' else f"{entry['etag']}-{encoding}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.vary.add('Accept-Encoding')
+    else:
+        response = _set_body(Response(mimetype=entry['mimetype']), entry['bodies'], encoding)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    g.http_cache_served = True
+    return response
+
+
+def _lookup(path, version):
+    entry = _GET_CACHE.get(path)
+    return entry if entry is not None and entry['version'] == version else None
+
+
+def enable_http_cache(server, versions, compress_callbacks=True, callback_path='/_dash-update-component'):
+    """
+    Serve GET endpoints with strong ETags and pre-compressed bodies, and compress callback responses.
+
+    The first response of a GET endpoint in `versions` is stored together with its gzip (and, if the `brotli` package
+    is installed, brotli) compressed body and an ETag computed from its content. Until the version of the endpoint
+    changes, further requests are answered from this cache without running the view, with `304 Not Modified` if the
+    client already has the body. Only one request per endpoint renders it, concurrent requests wait for its result.
+
+    Callback responses are POSTs and can not be revalidated. Their compressed bodies are cached by content hash, so
+    that sending the same data (e.g. a new snapshot) to many clients only compresses it once.
+
+    Parameters
+    ----------
+    server : flask.Flask
+        The server behind the Dash app.
+    versions : dict
+        path -> function returning the current version of the response, e.g. the hash of the data snapshot it
+        contains.
+    compress_callbacks : bool
+        Compress responses of `callback_path`.
+    """
+    for path in versions.keys():
+        _GET_LOCKS[path] = threading.Lock()
+
+    @server.before_request
+    def _serve_cached():
+        if request.method != 'GET' or request.path not in versions:
+            return None
+        entry = _lookup(request.path, versions[request.path]())
+        if entry is None:
+            # released in _release_lock, after _store_and_compress filled the cache
+            lock = _GET_LOCKS[request.path]
+            lock.acquire()
+            g.http_cache_lock = lock
+            entry = _lookup(request.path, versions[request.path]())
+        return _cached_response(entry) if entry is not None else None
+
+    @server.after_request
+    def _store_and_compress(response):
+        if g.get('http_cache_served', False) or response.status_code != 200 or response.direct_passthrough \
+                or 'Content-Encoding' in response.headers:
+            return response
+
+        if request.method == 'GET' and request.path in versions:
+            body = response.get_data()
+            entry = {'version': versions[request.path](), 'etag': hashlib.sha256(body).hexdigest(),
+                     'mimetype': response.mimetype, 'bodies': _compress(body)}
+            _GET_CACHE[request.path] = entry
+            return _cached_response(entry)
+
+        if compress_callbacks and request.method == 'POST' and request.path == callback_path:
+            body = response.get_data()
+            if len(body) < _MIN_COMPRESS_SIZE:
+                return response
+            key = hashlib.sha256(body).hexdigest()
+            if key not in _CALLBACK_BODIES:
+                _CALLBACK_BODIES[key] = _compress(body)
+                if len(_CALLBACK_BODIES) > _MAX_CALLBACK_BODIES:
+                    _CALLBACK_BODIES.popitem(last=False)
+            _CALLBACK_BODIES.move_to_end(key)
+            return _set_body(response, _CALLBACK_BODIES[key], _negotiate(_CALLBACK_BODIES[key]))
+
+        return response
+
+    @server.teardown_request
+    def _release_lock(_):
+        lock = g.pop('http_cache_lock', None)
+        if lock is not None:
+            lock.release()
@@ -0,0 +1,113 @@
+"""
+Benchmark of the log ingestion pipeline in `data_updating` on a simulated slow (network) filesystem.
+
+Synthetic logs are written to a temporary folder and accessed through `LatencyFiles`, which adds a fixed latency to
+every stat and to the first byte of every read. The serial baseline (listdir, then open/read/parse in each worker)
+is compared to `data_updating.ingest_logs` with different numbers of I/O threads.
+
+Example:
+    python3 ingest_benchmark.py -logs 200 -latency 0.02 -io_threads 1 8 32
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+from functools import partial
+from multiprocessing import Pool
+from time import sleep, time
+
+import data_updating
+
+
+class LatencyFiles:
+    """File layer that sleeps `latency` seconds for every metadata lookup and every file read."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def listdir(self, folder):
+        sleep(self.latency)
+        return os.listdir(folder)
+
+    def list_logs(self, folder):
+        sleep(self.latency)
+        return data_updating.list_logs(folder)
+
+    def stat(self, path):
+        sleep(self.latency)
+        return os.stat(path)
+
+    def read(self, path):
+        sleep(self.latency)
+        return data_updating.read_log(path)
+
+
+def write_synthetic_log(path, model='deit_small_patch16_224', n_epochs=100, seed=0):
+    rng = random.Random(seed)
+    run_date = f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2023_{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00"
+    with open(path, 'w') as f:
+        f.write("INFO: training on cuda -> NVIDIA A100-SXM4-40GB\n")
+        f.write(f"INFO: full set of arguments: {{'task': 'fine-tune', 'model': '{model}', 'world_size': 4, "
+                f"'batch_size': 256, 'imsize': 224, 'lr': 0.0003, 'num_workers': 44, 'dataset': 'imagenet'}}\n")
+        f.write(f"INFO: experiment_id={rng.randint(0, 1000)}\n")
+        f.write(f"INFO: Run name: '{model} {seed}_{run_date}'\n")
+        acc = 0.
+        for epoch in range(1, n_epochs + 1):
+            acc += (85. - acc) * 0.05
+            f.write(f"INFO: epoch {epoch}: loss={5 - acc / 20 + rng.random() / 10}, time={rng.uniform(200, 300)}s, "
+                    f"acc1={acc}%, acc5={min(acc + 10, 100)}%, learning rate={3e-4 * (1 - epoch / n_epochs)}, "
+                    f"validation_loss={5 - acc / 20}, validation_time={rng.uniform(10, 20)}s, "
+                    f"val_acc1={acc - 2}%, val_acc5={min(acc + 8, 100)}%\n")
+        f.write(f"INFO: Efficiency metrics: {{'throughput': {{'value': {rng.uniform(500, 5000)}, 'batch_size': 2048}}, "
+                f"'number of parameters': {rng.randint(5, 90) * 10**6}, 'flops': {rng.randint(1, 20) * 10**9}, "
+                f"'inference_memory_@1': {rng.randint(1, 4) * 2**30}, 'peak_memory_total': {rng.randint(20, 80) * 2**30}}}\n")
+
+
+def write_synthetic_logs(folder, n_logs, n_epochs=100):
+    models = ['deit_small_patch16_224', 'swin_small_patch4_window7_224', 'xcit_small_12_p16', 'performer_vit_small',
+              'efficientformerv2_s2', 'cait_xxs24', 'resnet50', 'linformer_vit_small']
+    for i in range(n_logs):
+        write_synthetic_log(os.path.join(folder, f"run_{i:05d}.log"), model=models[i % len(models)], n_epochs=n_epochs,
+                            seed=i)
+
+
+def _read_and_parse(files, path):
+    return data_updating.parse_run_log(files.read(path), path)
+
+
+def run_serial_baseline(folder, files, pool):
+    paths = [os.path.join(folder, f) for f in files.listdir(folder) if f.endswith('.log')]
+    return pool.map(partial(_read_and_parse, files), paths)
+
+
+def run_pipeline(folder, files, pool, n_io_threads, queue_size):
+    return data_updating.ingest_logs(folder, pool, n_io_threads=n_io_threads, queue_size=queue_size,
+                                     list_fn=files.list_logs, read_fn=files.read)
+
+
+def _timed(fn):
+    start = time()
+    runs = fn()
+    return {'seconds': time() - start, 'runs': len(runs)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-logs', type=int, default=200, help='number of synthetic log files')
+    parser.add_argument('-epochs', type=int, default=100, help='epochs per synthetic log')
+    parser.add_argument('-latency', type=float, default=0.02, help='injected latency per stat/read [s]')
+    parser.add_argument('-workers', type=int, default=5, help='number of parse processes')
+    parser.add_argument('-io_threads', type=int, nargs='+', default=[1, 4, 16, 32], help='I/O thread counts to test')
+    parser.add_argument('-queue_size', type=int, default=64, help='read-ahead queue size')
+    args = parser.parse_args()
+
+    files = LatencyFiles(args.latency)
+    results = {'logs': args.logs, 'epochs': args.epochs, 'latency': args.latency, 'workers': args.workers}
+    with tempfile.TemporaryDirectory() as folder, Pool(args.workers) as pool:
+        write_synthetic_logs(folder, args.logs, n_epochs=args.epochs)
+        results['serial baseline'] = _timed(lambda: run_serial_baseline(folder, files, pool))
+        for n_io_threads in args.io_threads:
+            results[f'pipeline ({n_io_threads} I/O threads)'] = _timed(
+                lambda: run_pipeline(folder, files, pool, n_io_threads, args.queue_size))
+    print(json.dumps(results, indent=2))
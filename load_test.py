@@ -0,0 +1,262 @@
+"""
+Load test of the Dash server in `-reload` mode with simulated concurrent viewers.
+
+The server is started in a subprocess on a synthetic snapshot (copies of the runs in data/data.json with jittered
+metrics). Each virtual client requests the layout and then keeps firing the `update-data` interval callback, like an
+open browser tab does. Meanwhile, the snapshot file is rewritten in the background, like `data_updating` does. The
+result (throughput, p50/p99 latency per endpoint, server RSS) is printed as JSON.
+
+Example:
+    python3 load_test.py -clients 20 -duration 60 -runs 500
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import warnings
+import urllib.error
+import urllib.request
+from time import sleep, time
+import numpy as np
+
+_REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+_SERVER_CODE = """
+import sys
+sys.argv = ['app.py', '-reload']
+sys.path.insert(0, {repo_dir!r})
+import app
+app.app.run_server(debug=False, port={port})
+"""
+_RELOAD_CALLBACK = {
+    'output': '..runs-store.data...aggregate-store.data...data-version.data..',
+    'outputs': [{'id': 'runs-store', 'property': 'data'}, {'id': 'aggregate-store', 'property': 'data'},
+                {'id': 'data-version', 'property': 'data'}],
+    'inputs': [{'id': 'update-data', 'property': 'n_intervals', 'value': 0}],
+    'changedPropIds': ['update-data.n_intervals'],
+    'state': [{'id': 'data-version', 'property': 'data', 'value': None}],
+}
+_ENDPOINTS = ['layout', 'update-data callback']
+_JITTERED_KEYS = ['throughput_value', 'peak_memory_total', 'top_val_acc1', 'top_acc1', 'final_validation_loss']
+
+
+def synthetic_snapshot(n_runs, seed=0):
+    """
+    Copies of the runs in data/data.json with unique run names and jittered metrics.
+    """
+    rng = random.Random(seed)
+    with open(os.path.join(_REPO_DIR, 'data', 'data.json'), 'r') as f:
+        base_runs = json.load(f)
+    runs = []
+    for i in range(n_runs):
+        run = dict(base_runs[i % len(base_runs)])
+        run['run_name'] = f"{run['run_name']} #{i}"
+        for key in _JITTERED_KEYS:
+            if isinstance(run.get(key), (int, float)):
+                run[key] = run[key] * rng.uniform(0.95, 1.05)
+        runs.append(run)
+    return runs
+
+
+def write_snapshot(runs, file_name):
+    with open(file_name + '.tmp', 'w') as f:
+        json.dump(runs, f)
+    os.replace(file_name + '.tmp', file_name)
+
+
+def _rewrite_snapshots(runs, file_name, interval, stop, counter):
+    # change a few runs every interval, like a cycle of data_updating with some active runs
+    rng = random.Random(1)
+    while not stop.wait(interval):
+        for run in rng.sample(runs, max(1, len(runs) // 20)):
+            run['top_val_acc1'] = rng.uniform(0.7, 0.85)
+        write_snapshot(runs, file_name)
+        counter['rewrites'] += 1
+
+
+def _server_rss(pid):
+    # resident set size in MB, None if it can not be read (e.g. not on Linux)
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def _monitor_rss(pid, stop, samples):
+    while not stop.wait(0.5):
+        rss = _server_rss(pid)
+        if rss is not None:
+            samples.append(rss)
+
+
+def _request(url, data=None, headers=None):
+    request = urllib.request.Request(url, data=data, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            body = response.read()
+            if response.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            return response.status, body, response.headers
+    except urllib.error.HTTPError as err:
+        return err.code, b'', err.headers
+
+
+def _client(base_url, duration, interval, results, lock):
+    """
+    One viewer: load the layout, then fire the interval callback for `duration` seconds (at least once).
+    """
+    version = None
+    records = []
+
+    def _timed(endpoint, *args, **kwargs):
+        start = time()
+        try:
+            status, body, headers = _request(*args, **kwargs)
+        except (urllib.error.URLError, OSError):
+            status, body, headers = 'error', b'', {}
+        records.append((endpoint, status, time() - start))
+        return status, body, headers
+
+    _timed('layout', base_url + '_dash-layout', headers={'Accept-Encoding': 'gzip'})
+    # the clock starts after the layout, a slow layout must not eat up the time for the callbacks
+    end = time() + duration
+    n_intervals = 0
+    while n_intervals == 0 or time() < end:
+        n_intervals += 1
+        payload = json.loads(json.dumps(_RELOAD_CALLBACK))
+        payload['inputs'][0]['value'] = n_intervals
+        payload['state'][0]['value'] = version
+        status, body, _ = _timed('update-data callback', base_url + '_dash-update-component',
+                                 data=json.dumps(payload).encode(),
+                                 headers={'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'})
+        if status == 200:
+            version = json.loads(body)['response']['data-version']['data']
+        sleep(interval)
+
+    with lock:
+        results.extend(records)
+
+
+def _start_server(folder, port):
+    code = _SERVER_CODE.format(repo_dir=_REPO_DIR, port=port)
+    server = subprocess.Popen([sys.executable, '-c', code], cwd=folder, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+    for _ in range(600):
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with code {server.returncode}")
+        try:
+            _request(f'http://127.0.0.1:{port}/')
+            return server
+        except (urllib.error.URLError, OSError):
+            sleep(0.5)
+    server.kill()
+    raise RuntimeError("server did not start")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _summary(records, duration):
+    summary = {}
+    for endpoint in _ENDPOINTS:
+        latencies = np.array([rec[2] for rec in records if rec[0] == endpoint]) * 1000
+        statuses = {}
+        for rec in records:
+            if rec[0] == endpoint:
+                statuses[str(rec[1])] = statuses.get(str(rec[1]), 0) + 1
+        if not any(status in statuses for status in ['200', '204']):
+            warnings.warn(f"no successful requests to endpoint '{endpoint}', its latencies are not meaningful")
+        summary[endpoint] = {'requests': len(latencies), 'throughput [req/s]': len(latencies) / duration,
+                             'p50 latency [ms]': np.percentile(latencies, 50).item() if len(latencies) > 0 else None,
+                             'p99 latency [ms]': np.percentile(latencies, 99).item() if len(latencies) > 0 else None,
+                             'status codes': statuses}
+    return summary
+
+
+def run_load_test(n_clients=10, duration=30, n_runs=500, interval=1., rewrite_interval=10., port=None):
+    """
+    Run the load test and return the report as a dict.
+
+    Parameters
+    ----------
+    n_clients : int
+        Number of concurrent virtual viewers.
+    duration : float
+        Seconds each viewer keeps firing callbacks after it received the layout.
+    n_runs : int
+        Number of runs in the synthetic snapshot.
+    interval : float
+        Seconds between two callbacks of a viewer (the app uses 10s; lower values simulate more viewers).
+    rewrite_interval : float
+        Seconds between two rewrites of the snapshot file.
+    port : int
+        Port for the server, a free one if None.
+    """
+    port = port or _free_port()
+    base_url = f'http://127.0.0.1:{port}/'
+    folder = tempfile.mkdtemp()
+    runs = synthetic_snapshot(n_runs)
+    os.makedirs(os.path.join(folder, 'data'))
+    write_snapshot(runs, os.path.join(folder, 'data', 'data.json'))
+    write_snapshot(runs, os.path.join(folder, 'data_tmp.json'))
+
+    server = _start_server(folder, port)
+    stop = threading.Event()
+    rss_samples = [_server_rss(server.pid)]
+    counter = {'rewrites': 0}
+    results, lock = [], threading.Lock()
+    try:
+        background = [threading.Thread(target=_monitor_rss, args=(server.pid, stop, rss_samples), daemon=True),
+                      threading.Thread(target=_rewrite_snapshots,
+                                       args=(runs, os.path.join(folder, 'data_tmp.json'), rewrite_interval, stop,
+                                             counter), daemon=True)]
+        clients = [threading.Thread(target=_client, args=(base_url, duration, interval, results, lock))
+                   for _ in range(n_clients)]
+        start = time()
+        for thread in background + clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        elapsed = time() - start
+        stop.set()
+        rss_samples.append(_server_rss(server.pid))
+    finally:
+        stop.set()
+        server.kill()
+        server.wait()
+        shutil.rmtree(folder, ignore_errors=True)
+
+    rss_samples = [rss for rss in rss_samples if rss is not None]
+    return {'clients': n_clients, 'duration [s]': elapsed, 'runs': n_runs, 'snapshot rewrites': counter['rewrites'],
+            'requests': len(results), 'throughput [req/s]': len(results) / elapsed,
+            'endpoints': _summary(results, elapsed),
+            'server RSS [MB]': {'start': rss_samples[0], 'peak': max(rss_samples), 'end': rss_samples[-1]}
+            if len(rss_samples) > 0 else None}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-clients', type=int, default=10, help='number of concurrent virtual viewers')
+    parser.add_argument('-duration', type=float, default=30, help='duration of the test [s]')
+    parser.add_argument('-runs', type=int, default=500, help='number of runs in the synthetic snapshot')
+    parser.add_argument('-interval', type=float, default=1., help='seconds between callbacks of one viewer')
+    parser.add_argument('-rewrite_interval', type=float, default=10., help='seconds between snapshot rewrites')
+    parser.add_argument('-port', type=int, default=None, help='server port (default: a free one)')
+    args = parser.parse_args()
+
+    report = run_load_test(n_clients=args.clients, duration=args.duration, n_runs=args.runs, interval=args.interval,
+                           rewrite_interval=args.rewrite_interval, port=args.port)
+    print(json.dumps(report, indent=2))
@@ -1,9 +1,11 @@
 import contextlib
+import hashlib
 import json
 import os
 import sys
 from json import JSONDecodeError
 from time import sleep
+import numpy as np
 import pandas as pd
 import taxonomy as tx
 
@@ -83,6 +85,28 @@ _METRIC_CONVERSION_FACTOR = {
 }
 
 
+# derived metric name -> (numerator column, denominator column), computed after the unit conversion
+_DERIVED_METRICS = {
+    'top-1 validation accuracy per GFLOP': ('top-1 validation accuracy', 'GFLOPs'),
+    'throughput per parameter [ims/s/Millions]': ('throughput [ims/s]', 'number of parameters [Millions]'),
+    'throughput per inference VRAM @64 [ims/s/GB]': ('throughput [ims/s]', 'inference VRAM @64 [GB]'),
+    'top-1 validation accuracy per GPU-hour': ('top-1 validation accuracy', 'total finetuning time [h*GPUs]'),
+}
+
+# column -> expected value; cells of runs that deviate from it are marked in the table
+_EXPECTED_CONFIG = {
+    'image resolution (pretraining) [px]': 224, 'image resolution (finetuning) [px]': 224,
+    'GPUS (pretraining)': 4, 'GPUs (finetuning)': 4,
+    'dataloader workers (pretraining)': 44, 'dataloader workers (finetuning)': 44,
+    'lr (pretraining)': 3e-3, 'lr (finetuning)': 3e-4, 'optimizer eps': 1e-7,
+}
+# columns where cells with the expected value are marked as well
+_MARK_EXPECTED = ['lr (finetuning)']
+
+# file name -> ((mtime, size), sha256 of the file, DataFrame), see load_snapshot
+_SNAPSHOT_CACHE = {}
+
+
 class _DummyFile():
     def write(self, *args, **kwargs):
         pass
@@ -96,15 +120,105 @@ def no_print():
     sys.stdout = save_stdout
 
 
-def load_data(file_name=None, order_by_date=False, include_run_name=False):
+def _ratio(numerator, denominator):
+    numerator = pd.to_numeric(numerator, errors='coerce').to_numpy(dtype=float)
+    denominator = pd.to_numeric(denominator, errors='coerce').to_numpy(dtype=float)
+    ratio = np.full_like(numerator, np.nan)
+    np.divide(numerator, denominator, out=ratio, where=denominator > 0)
+    return ratio
+
+
+def derived_metric_names():
+    return list(_DERIVED_METRICS.keys())
+
+
+def add_derived_metrics(df):
+    """
+    Add the columns of `_DERIVED_METRICS` to a DataFrame of runs.
+
+    Each metric is computed for the whole column at once. Rows where the denominator is missing or not positive get
+    NaN.
+    """
+    for name, (numerator, denominator) in _DERIVED_METRICS.items():
+        df[name] = _ratio(df[numerator], df[denominator])
+    return df
+
+
+def _file_version(file_name):
+    stat = os.stat(file_name)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def expected_config():
+    """
+    The columns checked by `deviation_flags`, in the order of their bits.
+    """
+    return {'columns': list(_EXPECTED_CONFIG.keys()), 'mark_expected': _MARK_EXPECTED}
+
+
+def deviation_flags(df):
+    """
+    Compare each run to `_EXPECTED_CONFIG`.
+
+    Returns
+    -------
+    pd.Series
+        Bitmask per run, bit i is set if the run's value in the i-th column of `_EXPECTED_CONFIG` differs from the
+        expected one. Missing values do not count as deviations.
+    """
+    flags = np.zeros(len(df), dtype=np.int64)
+    for bit, (col, expected) in enumerate(_EXPECTED_CONFIG.items()):
+        if isinstance(expected, (int, float)):
+            vals = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)
+            # relative tolerance only, an absolute one would swallow deviations of small values like eps
+            deviates = ~np.isnan(vals) & ~np.isclose(vals, expected, rtol=1e-5, atol=0)
+        else:
+            deviates = (df[col].notna() & (df[col] != expected)).to_numpy()
+        flags |= deviates.astype(np.int64) << bit
+    return pd.Series(flags, index=df.index)
+
+
+def run_keys(df):
+    """
+    Identify runs by a single string, a hash of model, run name and run date.
+
+    The clientside callbacks use it to look up hidden and highlighted runs.
+    """
+    hashes = pd.util.hash_pandas_object(df[['model', 'run name', 'run date']], index=False)
+    return hashes.map('{:016x}'.format)
+
+
+def load_snapshot(file_name=None):
+    """
+    Load a data file into a DataFrame with one row per run.
+
+    The DataFrame is cached together with the modification time, size and content hash of the file, so for every
+    snapshot of the data the parsing, unit conversion and derived metrics are only computed once. It is shared between callers and
+    must not be modified in place.
+    """
     if file_name is None:
         file_name = _DATA_FILE
-    with open(file_name, 'r') as f:
-        try:
-            runs = json.load(f)
-        except JSONDecodeError:
-            sleep(10)
-            runs = json.load(f)
+    version = _file_version(file_name)
+    if file_name in _SNAPSHOT_CACHE and _SNAPSHOT_CACHE[file_name][0] == version:
+        return _SNAPSHOT_CACHE[file_name][2]
+
+    with open(file_name, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    if file_name in _SNAPSHOT_CACHE and _SNAPSHOT_CACHE[file_name][1] == digest:
+        # rewritten with the same content
+        _SNAPSHOT_CACHE[file_name] = (version, ) + _SNAPSHOT_CACHE[file_name][1:]
+        return _SNAPSHOT_CACHE[file_name][2]
+
+    try:
+        runs = json.loads(content)
+    except JSONDecodeError:
+        sleep(10)
+        version = _file_version(file_name)
+        with open(file_name, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        runs = json.loads(content)
 
     runs = [run for run in runs if 'model' in run and run['model'] is not None and 'run_date' in run and run['run_date'] is not None]
 
@@ -119,6 +233,27 @@ def load_data(file_name=None, order_by_date=False, include_run_name=False):
                                                for k, k_old in _PER_EPOCH_METRICS.items() if k_old in ep_data} for ep, ep_data in run['epoch_data'].items()} for run in runs]
     run_data['epoch_data'] = [json.dumps(run) for run in run_data['epoch_data']]
     df = pd.DataFrame(run_data)
+    df['run date'] = pd.to_datetime(df['run date'], format=_DATETIME_FORMAT)
+    df['run key'] = run_keys(df)
+    df['deviations'] = deviation_flags(df)
+    df = add_derived_metrics(df)
+
+    _SNAPSHOT_CACHE[file_name] = (version, digest, df)
+    return df
+
+
+def snapshot_hash(file_name=None):
+    """
+    Content hash (sha256 hex digest) of the current snapshot of a data file.
+    """
+    if file_name is None:
+        file_name = _DATA_FILE
+    load_snapshot(file_name)
+    return _SNAPSHOT_CACHE[file_name][1]
+
+
+def load_data(file_name=None, order_by_date=False, include_run_name=False):
+    df = load_snapshot(file_name)
 
     cols_first = ['run name', 'model', 'taxonomy class', 'top-1 validation accuracy', 'number of parameters [Millions]',
                   'GFLOPs',
@@ -127,7 +262,8 @@ def load_data(file_name=None, order_by_date=False, include_run_name=False):
                   'inference VRAM @1 [GB]', 'inference VRAM @32 [GB]', 'inference VRAM @64 [GB]',
                   'inference VRAM @128 [GB]',
                   'total finetuning time [h*GPUs]', 'total validation time [h*GPUs]', 'validation loss', 'training loss',
-                  'top-5 validation accuracy', 'top-1 training accuracy', 'top-5 training accuracy']
+                  'top-5 validation accuracy', 'top-1 training accuracy', 'top-5 training accuracy'] \
+                 + derived_metric_names()
 
     if order_by_date:
         cols_first.insert(1, 'run date')
@@ -145,7 +281,6 @@ def load_data(file_name=None, order_by_date=False, include_run_name=False):
     if not include_run_name:
         columns.remove('run name')
 
-    df['run date'] = pd.to_datetime(df['run date'], format=_DATETIME_FORMAT)
     if order_by_date:
         df = df.sort_values('run date', ascending=False)
     else: